@@ -3,35 +3,119 @@ REST API Backend Application
 Flask-based RESTful API with CRUD operations, authentication, and SQL database integration
 """
 
-from flask import Flask, request, jsonify, g, send_from_directory
+from flask import Flask, Response, request, g, send_from_directory
+from flask.json.provider import DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from sqlalchemy import column, delete, event, func, insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 from datetime import datetime, timedelta
 from functools import wraps
+from operator import attrgetter, itemgetter
 import os
+import re
 import logging
+import logging.handlers
+import atexit
+import queue
 import jwt
+import base64
 import hashlib
+import hmac
 import secrets
+import sqlite3
+import threading
+import time
+import cachetools
+import orjson
+
+
+# Int keys (e.g. grouped counts) serialize like the stdlib json module would
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, used by jsonify and request.get_json()"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='static', static_url_path='')
+app.json = OrjsonProvider(app)
 
 # ==================== CONFIGURATION ====================
 
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'database.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or \
+    'sqlite:///' + os.path.join(basedir, 'database.db')
+# The connect arguments and PRAGMAs below, the FTS5 search indexes, the table
+# version triggers and the SQL_NOW timestamps are all SQLite-specific
+database_backend = make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+if database_backend != 'sqlite':
+    raise RuntimeError(f'DATABASE_URL must be a SQLite URL (sqlite:///path/to/file.db), not {database_backend}')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JSON_SORT_KEYS'] = False
+if app.config['SQLALCHEMY_DATABASE_URI'] in ('sqlite://', 'sqlite:///:memory:'):
+    # In-memory database (the test suite): every checkout must get the one connection holding
+    # it, and returning one checkout must not roll back work still open on the others
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'poolclass': StaticPool,
+        'pool_reset_on_return': None,
+        'connect_args': {'check_same_thread': False}
+    }
+else:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': 20,
+        'max_overflow': 40,
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+        'connect_args': {'check_same_thread': False, 'timeout': 30}  # Share pooled connections across worker threads
+    }
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or secrets.token_hex(32)
 app.config['JWT_EXPIRATION_HOURS'] = 24
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 3600  # Frontend and static files; revalidated via ETag
+# Shared limiter state: with redis://... every worker counts against the same window
+# (the moving window is one atomic Lua script per hit); memory:// is per process
+app.config['RATELIMIT_STORAGE_URI'] = os.environ.get('RATELIMIT_STORAGE_URI', 'memory://')
+app.config['RATELIMIT_STRATEGY'] = 'moving-window'
 
 # Initialize extensions
 db = SQLAlchemy(app)
 CORS(app, resources={r"/api/*": {"origins": "*"}})  # Enable CORS for API routes
 
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune every new SQLite connection: WAL journal so readers don't block writers"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA busy_timeout=5000')
+    cursor.execute('PRAGMA cache_size=-64000')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA mmap_size=268435456')  # Read up to 256 MB of pages via mmap, not read()
+    cursor.close()
+
+
+# Fail loudly on accidental lazy loads (n+1 queries) during development
+if app.debug:
+    from nplusone.ext.flask_sqlalchemy import NPlusOne
+    app.config['NPLUSONE_RAISE'] = True
+    NPlusOne(app)
+
 # Rate limiting
 limiter = Limiter(
     app=app,
@@ -41,14 +125,46 @@ limiter = Limiter(
 
 # ==================== LOGGING SETUP ====================
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('api.log'),
-        logging.StreamHandler()
-    ]
-)
+# Request threads only enqueue records; a listener thread writes them to api.log
+# and to stderr, which gunicorn and container log collectors read.
+# LOG_TO_CONSOLE=0 keeps only the file.
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+log_listener = None
+log_queue_handler = None
+
+
+def start_log_listener():
+    """Install the queue handler and start its listener (again in each forked worker)"""
+    global log_listener, log_queue_handler
+    if log_listener is not None:
+        # After a fork the inherited listener thread is gone; just release its files
+        for handler in log_listener.handlers:
+            handler.close()
+        logging.root.removeHandler(log_queue_handler)
+    
+    handlers = [logging.FileHandler('api.log')]
+    if os.environ.get('LOG_TO_CONSOLE', '1') != '0':
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    
+    # Added next to whatever handlers the host process already installed on the root logger
+    log_queue = queue.SimpleQueue()
+    log_queue_handler = logging.handlers.QueueHandler(log_queue)
+    logging.root.addHandler(log_queue_handler)
+    logging.root.setLevel(logging.INFO)
+    log_listener = logging.handlers.QueueListener(log_queue, *handlers)
+    log_listener.start()
+
+
+@atexit.register
+def stop_log_listener():
+    """Flush queued records before the process exits"""
+    if log_listener is not None:
+        log_listener.stop()
+
+
+start_log_listener()
 logger = logging.getLogger(__name__)
 
 
@@ -67,39 +183,140 @@ def log_response_info(response):
     return response
 
 
+# ==================== RESPONSE HELPER ====================
+
+def json_response(payload, status=200):
+    """Serialize payload with orjson (native datetime support) into a JSON response"""
+    if isinstance(payload, bytes):
+        body = payload  # Already serialized, e.g. a prebuilt_error() body
+    else:
+        body = dump_json(payload)
+    return Response(body, status=status, mimetype='application/json')
+
+
+def dump_json(payload):
+    """Serialize payload to JSON bytes exactly as json_response() would"""
+    return orjson.dumps(payload, default=app.json.default, option=ORJSON_OPTIONS)
+
+
+def parse_json():
+    """Decode the request body with orjson; None if it is empty or not valid JSON"""
+    # Straight from the raw bytes: no mimetype check, no cached copy of the body
+    try:
+        return orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        return None
+
+
+def prebuilt_error(error, message):
+    """Serialize a fixed error payload once, at import time"""
+    return orjson.dumps({'success': False, 'error': error, 'message': message})
+
+
+# Bodies for errors whose message never varies; json_response() sends them as-is
+ERR_TOKEN_REQUIRED = prebuilt_error('Unauthorized', 'Token or API key is required')
+ERR_TOKEN_EXPIRED = prebuilt_error('Unauthorized', 'Token has expired')
+ERR_ADMIN_REQUIRED = prebuilt_error('Forbidden', 'Admin access required')
+ERR_USER_EXISTS = prebuilt_error('Conflict', 'Username or email already exists')
+ERR_NOT_FOUND = prebuilt_error('Not Found', 'The requested resource was not found')
+ERR_RATE_LIMITED = prebuilt_error('Too Many Requests', 'Rate limit exceeded. Please try again later.')
+ERR_INTERNAL = prebuilt_error('Internal Server Error', 'An unexpected error occurred')
+ERR_NO_INPUT = prebuilt_error('Bad Request', 'No input data provided')
+ERR_USERNAME_EXISTS = prebuilt_error('Conflict', 'Username already exists')
+ERR_EMAIL_EXISTS = prebuilt_error('Conflict', 'Email already exists')
+ERR_CREDENTIALS_REQUIRED = prebuilt_error('Bad Request', 'Username and password required')
+ERR_INVALID_CREDENTIALS = prebuilt_error('Unauthorized', 'Invalid username or password')
+ERR_ACCOUNT_DEACTIVATED = prebuilt_error('Forbidden', 'Account is deactivated')
+ERR_API_KEY_NOT_FOUND = prebuilt_error('Not Found', 'API key not found')
+ERR_OWN_PROFILE_ONLY = prebuilt_error('Forbidden', 'You can only update your own profile')
+ERR_DELETE_SELF = prebuilt_error('Forbidden', 'Cannot delete your own account')
+ERR_EXPECTED_PRODUCT_ARRAY = prebuilt_error('Bad Request', 'Expected an array of products')
+ERR_INVALID_CURSOR = prebuilt_error('Bad Request', 'Invalid pagination cursor')
+# Templates with a single %d slot for the missing row's id: ERR_PRODUCT_ID_NOT_FOUND % product_id
+ERR_USER_ID_NOT_FOUND = prebuilt_error('Not Found', 'User with ID %d not found')
+ERR_PRODUCT_ID_NOT_FOUND = prebuilt_error('Not Found', 'Product with ID %d not found')
+USER_CONFLICT_ERRORS = {  # find_user_conflict() message -> prebuilt body
+    'Username already exists': ERR_USERNAME_EXISTS,
+    'Email already exists': ERR_EMAIL_EXISTS,
+}
+
+
 # ==================== DATABASE MODELS ====================
 
+# Timestamps are computed by SQLite itself. CURRENT_TIMESTAMP only has one-second
+# resolution, so keep milliseconds: updated_at must move on every write.
+# Columns pass SQL_NOW as default= too, so every INSERT names it explicitly:
+# tables created before the server defaults existed are not altered by create_all()
+SQL_NOW = func.strftime('%Y-%m-%d %H:%M:%f', 'now')
+
+# Argon2id with argon2-cffi's default (RFC 9106 low-memory) cost parameters
+password_hasher = PasswordHasher()
+# Verified against when a login names no existing user, so that branch costs a full
+# Argon2 verify too and response times do not reveal which usernames exist
+DUMMY_PASSWORD_HASH = password_hasher.hash(secrets.token_hex(16))
+
+
 class User(db.Model):
     """User model for the database"""
     __tablename__ = 'users'
+    __table_args__ = (
+        # Default ordering of the list endpoint
+        db.Index('ix_users_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False, index=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
-    password_hash = db.Column(db.String(256), nullable=True)
+    password_hash = db.Column(db.String(128), nullable=True)  # Argon2id hash string
     role = db.Column(db.String(20), default='user')  # 'user' or 'admin'
     is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=SQL_NOW, server_default=SQL_NOW)
+    updated_at = db.Column(db.DateTime, default=SQL_NOW, server_default=SQL_NOW, onupdate=SQL_NOW)
+    
+    # Columns mirrored into the users_fts search index
+    SEARCH_FIELDS = ('username', 'email')
+    # NOT NULL columns that keyset pagination can order by (id breaks ties)
+    KEYSET_SORT_FIELDS = ('id', 'username', 'email', 'created_at', 'updated_at')
+    
+    # to_dict() keys, read in one C-level attrgetter call; email is appended on demand
+    SERIALIZED_FIELDS = ('id', 'username', 'role', 'is_active', 'created_at', 'updated_at')
+    get_serialized_fields = attrgetter(*SERIALIZED_FIELDS)
+    
+    @staticmethod
+    def hash_password(password):
+        """Return the stored hash for a plain-text password"""
+        return password_hasher.hash(password)
     
     def set_password(self, password):
         """Hash and set the password"""
-        self.password_hash = hashlib.sha256(password.encode()).hexdigest()
+        self.password_hash = User.hash_password(password)
+    
+    def has_legacy_password(self):
+        """True if the stored hash predates Argon2 (an unsalted SHA-256 digest)"""
+        stored = self.password_hash
+        return isinstance(stored, bytes) or not stored.startswith('$argon2')
     
     def check_password(self, password):
         """Check if password matches"""
-        return self.password_hash == hashlib.sha256(password.encode()).hexdigest()
+        stored = self.password_hash
+        if not stored:
+            return False
+        if self.has_legacy_password():
+            # Raw digest bytes, or its hex in the oldest rows; login() rehashes either
+            digest = hashlib.sha256(password.encode()).digest()
+            return hmac.compare_digest(stored, digest if isinstance(stored, bytes) else digest.hex())
+        try:
+            return password_hasher.verify(stored, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    
+    def password_needs_rehash(self):
+        """True if a verified password should be stored again with the current hasher"""
+        return self.has_legacy_password() or password_hasher.check_needs_rehash(self.password_hash)
     
     def to_dict(self, include_email=True):
         """Convert model to dictionary"""
-        data = {
-            'id': self.id,
-            'username': self.username,
-            'role': self.role,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+        data = dict(zip(User.SERIALIZED_FIELDS, User.get_serialized_fields(self)))
         if include_email:
             data['email'] = self.email
         return data
@@ -108,30 +325,37 @@ class User(db.Model):
 class Product(db.Model):
     """Product model for the database"""
     __tablename__ = 'products'
+    __table_args__ = (
+        # Default ordering of the list endpoint, unfiltered and filtered by category
+        db.Index('ix_products_created_at', 'created_at'),
+        db.Index('ix_products_category_created_at', 'category', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, index=True)
     description = db.Column(db.Text)
     price = db.Column(db.Float, nullable=False)
     quantity = db.Column(db.Integer, default=0)
-    category = db.Column(db.String(50), index=True)
+    category = db.Column(db.String(50))  # Indexed via ix_products_category_created_at
     is_available = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=SQL_NOW, server_default=SQL_NOW)
+    updated_at = db.Column(db.DateTime, default=SQL_NOW, server_default=SQL_NOW, onupdate=SQL_NOW)
+    
+    # Columns mirrored into the products_fts search index
+    SEARCH_FIELDS = ('name', 'description')
+    # NOT NULL columns that keyset pagination can order by (id breaks ties)
+    KEYSET_SORT_FIELDS = ('id', 'name', 'price', 'created_at', 'updated_at')
+    
+    # to_dict() keys, read in one C-level attrgetter call
+    SERIALIZED_FIELDS = (
+        'id', 'name', 'description', 'price', 'quantity',
+        'category', 'is_available', 'created_at', 'updated_at'
+    )
+    get_serialized_fields = attrgetter(*SERIALIZED_FIELDS)
     
     def to_dict(self):
         """Convert model to dictionary"""
-        return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
-            'price': self.price,
-            'quantity': self.quantity,
-            'category': self.category,
-            'is_available': self.is_available,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+        return dict(zip(Product.SERIALIZED_FIELDS, Product.get_serialized_fields(self)))
 
 
 class ApiKey(db.Model):
@@ -139,188 +363,507 @@ class ApiKey(db.Model):
     __tablename__ = 'api_keys'
     
     id = db.Column(db.Integer, primary_key=True)
-    key = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    key_hash = db.Column(db.LargeBinary(32), unique=True, nullable=False)  # SHA-256 of the key; the key itself is never stored
+    key_prefix = db.Column(db.String(8), nullable=False)  # Shown in listings so users can tell keys apart
     name = db.Column(db.String(100), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=SQL_NOW, server_default=SQL_NOW)
     expires_at = db.Column(db.DateTime)
     
     user = db.relationship('User', backref=db.backref('api_keys', lazy=True))
     
+    @staticmethod
+    def hash_key(key):
+        """Return the stored hash for a plain-text API key"""
+        return hashlib.sha256(key.encode()).digest()
+    
+    def set_key(self, key):
+        """Hash and set the key, keeping its public prefix"""
+        self.key_hash = ApiKey.hash_key(key)
+        self.key_prefix = key[:8]
+    
     def to_dict(self):
         return {
             'id': self.id,
             'name': self.name,
-            'key': self.key[:8] + '...',  # Only show first 8 chars
+            'key': self.key_prefix + '...',  # Only show first 8 chars
             'is_active': self.is_active,
-            'created_at': self.created_at.isoformat(),
-            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+            'created_at': self.created_at,
+            'expires_at': self.expires_at
         }
 
 
+# List endpoints select these columns directly (same keys and order as to_dict)
+# instead of building ORM objects; password_hash is never loaded
+USER_LIST_COLUMNS = tuple(getattr(User, name) for name in User.SERIALIZED_FIELDS + ('email',))
+PRODUCT_LIST_COLUMNS = tuple(getattr(Product, name) for name in Product.SERIALIZED_FIELDS)
+# For INSERT/UPDATE ... RETURNING: SQLite returns integral REAL values as int
+# before column affinity applies, so price is cast back to a float
+PRODUCT_RETURNING_COLUMNS = tuple(
+    db.cast(column, db.Float).label('price') if column is Product.price else column
+    for column in PRODUCT_LIST_COLUMNS
+)
+
+
+# ==================== FULL-TEXT SEARCH ====================
+
+# Each searchable table gets an external-content FTS5 index kept in sync by
+# triggers. The trigram tokenizer matches arbitrary substrings case-insensitively,
+# so MATCH answers the same question as ilike('%term%') without a table scan.
+SEARCH_MODELS = (User, Product)
+SEARCH_MIN_LENGTH = 3  # Trigrams cannot match shorter terms
+
+
+def search_index_ddl(table, fields):
+    """CREATE statements for a table's FTS5 index and its sync triggers"""
+    fts = f'{table}_fts'
+    cols = ', '.join(fields)
+    new_values = ', '.join(f'new.{name}' for name in fields)
+    old_values = ', '.join(f'old.{name}' for name in fields)
+    remove = f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});"
+    add = f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});"
+    return (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, "
+        f"content='{table}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN {add} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN {remove} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {cols} ON {table} "
+        f"BEGIN {remove} {add} END",
+    )
+
+
+def create_search_index(table, connection, **kw):
+    """Create and populate the FTS5 index for a table unless it already exists"""
+    fts = f'{table.name}_fts'
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': fts}
+    ).first()
+    if exists:
+        return
+    
+    model = next(model for model in SEARCH_MODELS if model.__table__ is table)
+    for statement in search_index_ddl(table.name, model.SEARCH_FIELDS):
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def drop_search_index(table, connection, **kw):
+    """Drop a table's FTS5 index (its triggers go with the table)"""
+    connection.exec_driver_sql(f'DROP TABLE IF EXISTS {table.name}_fts')
+
+
+for model in SEARCH_MODELS:
+    event.listen(model.__table__, 'after_create', create_search_index)
+    event.listen(model.__table__, 'before_drop', drop_search_index)
+
+
+# ==================== TABLE VERSIONS ====================
+
+# A per-table write counter in table_versions, bumped by triggers on every
+# INSERT/UPDATE/DELETE, whichever process runs it. List ETags are built from it
+# with one primary-key lookup instead of aggregates over the whole table.
+VERSIONED_MODELS = (User, Product)
+TABLE_VERSION_QUERY = text('SELECT version FROM table_versions WHERE name = :name')
+
+
+def version_tracking_ddl(table):
+    """Statements creating a table's table_versions row and its bump triggers"""
+    bump = f"UPDATE table_versions SET version = version + 1 WHERE name = '{table}';"
+    return (
+        'CREATE TABLE IF NOT EXISTS table_versions '
+        '(name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)',
+        f"INSERT OR IGNORE INTO table_versions (name) VALUES ('{table}')",
+        *(f'CREATE TRIGGER IF NOT EXISTS {table}_version_{operation.lower()} '
+          f'AFTER {operation} ON {table} BEGIN {bump} END'
+          for operation in ('INSERT', 'UPDATE', 'DELETE')),
+    )
+
+
+def create_version_tracking(table, connection, **kw):
+    """Start counting writes to a table (idempotent)"""
+    for statement in version_tracking_ddl(table.name):
+        connection.exec_driver_sql(statement)
+
+
+for model in VERSIONED_MODELS:
+    event.listen(model.__table__, 'after_create', create_version_tracking)
+
+
+def search_filter(model, term):
+    """Filter matching `term` as a substring of any of the model's SEARCH_FIELDS"""
+    if len(term) < SEARCH_MIN_LENGTH:
+        return db.or_(*(getattr(model, name).ilike(f'%{term}%') for name in model.SEARCH_FIELDS))
+    
+    fts = f'{model.__tablename__}_fts'
+    phrase = '"' + term.replace('"', '""') + '"'  # Quoted, so FTS5 query syntax is inert
+    matches = text(f'SELECT rowid FROM {fts} WHERE {fts} MATCH :term').bindparams(term=phrase)
+    return model.id.in_(matches.columns(column('rowid')))
+
+
 # ==================== AUTHENTICATION ====================
 
+# Short-lived, per-process caches for the auth hot path. A hit skips jwt.decode
+# (or the API key SELECT) and the User SELECT; the TTL bounds how long a
+# revoked credential or changed user can linger in other worker processes.
+AUTH_CACHE_TTL = 10
+credential_cache = cachetools.TTLCache(maxsize=10000, ttl=AUTH_CACHE_TTL)  # digest -> (user_id, expiry)
+user_cache = cachetools.TTLCache(maxsize=10000, ttl=AUTH_CACHE_TTL)  # user_id -> column snapshot
+auth_cache_lock = threading.Lock()
+
+
+def credential_digest(credential):
+    """Fixed-size cache key for a JWT or API key (for a key, equal to its key_hash)"""
+    return hashlib.sha256(credential.encode()).digest()
+
+
+def load_auth_user(user_id):
+    """Load the user for g.current_user, rebuilt from a cached snapshot when possible"""
+    with auth_cache_lock:
+        snapshot = user_cache.get(user_id)
+    if snapshot is not None:
+        return User(**snapshot)  # Transient instance: never added to the session
+    
+    # Column-only SELECT: no identity-map entry, and password_hash is never read
+    row = db.session.execute(select(*USER_LIST_COLUMNS).where(User.id == user_id)).first()
+    if row is None:
+        return None
+    return remember_auth_user(row._asdict())
+
+
+def remember_auth_user(snapshot):
+    """Cache a user's column snapshot and return it as a transient User"""
+    with auth_cache_lock:
+        user_cache[snapshot['id']] = snapshot
+    return User(**snapshot)
+
+
+def invalidate_auth_user(user_id):
+    """Drop a user's cached snapshot after it changes"""
+    with auth_cache_lock:
+        user_cache.pop(user_id, None)
+
+
+def invalidate_credential(digest):
+    """Drop a cached JWT or API key lookup by its credential_digest()"""
+    with auth_cache_lock:
+        credential_cache.pop(digest, None)
+
+
+def clear_auth_cache():
+    """Empty both auth caches"""
+    with auth_cache_lock:
+        credential_cache.clear()
+        user_cache.clear()
+
+
+def b64url(data):
+    """Unpadded base64url, as used in JWT segments"""
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+# The header never changes, and an HMAC object keyed once can be copy()'d
+# instead of re-deriving the pad schedule on every login. Verification stays
+# with jwt.decode.
+JWT_HS256_HEADER = b64url(orjson.dumps({'alg': 'HS256', 'typ': 'JWT'}))
+jwt_keys = None  # (SECRET_KEY, key bytes, keyed hmac), rebuilt if SECRET_KEY changes
+
+
+def jwt_signing_keys():
+    """Return the HS256 key as bytes and an HMAC keyed with it, derived once per SECRET_KEY"""
+    global jwt_keys
+    keys = jwt_keys
+    secret = app.config['SECRET_KEY']
+    if keys is None or keys[0] != secret:
+        key = secret.encode()
+        keys = jwt_keys = (secret, key, hmac.new(key, digestmod=hashlib.sha256))
+    return keys[1], keys[2]
+
+
+def encode_hs256(payload):
+    """Sign payload as an HS256 JWT; equivalent to jwt.encode(..., algorithm='HS256')"""
+    signing_input = JWT_HS256_HEADER + b'.' + b64url(orjson.dumps(payload))
+    mac = jwt_signing_keys()[1].copy()
+    mac.update(signing_input)
+    return (signing_input + b'.' + b64url(mac.digest())).decode()
+
+
 def generate_token(user_id, role='user'):
     """Generate JWT token"""
+    now = int(time.time())
     payload = {
         'user_id': user_id,
         'role': role,
-        'exp': datetime.utcnow() + timedelta(hours=app.config['JWT_EXPIRATION_HOURS']),
-        'iat': datetime.utcnow()
+        'exp': now + app.config['JWT_EXPIRATION_HOURS'] * 3600,
+        'iat': now
     }
-    return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
+    return encode_hs256(payload)
+
+
+def authenticate():
+    """Set g.current_user from a Bearer token or X-API-Key; return an error response on failure"""
+    headers = request.headers
+    auth_header = headers.get('Authorization', '')
+    token = auth_header.split(' ')[1] if auth_header.startswith('Bearer ') else None
+    api_key = headers.get('X-API-Key')
+    
+    if not token and not api_key:
+        return json_response(ERR_TOKEN_REQUIRED, 401)
+    
+    try:
+        if token:
+            digest = credential_digest(token)
+            with auth_cache_lock:
+                cached = credential_cache.get(digest)
+            # Cached entries hold the token's exp claim (epoch seconds)
+            if cached and cached[1] > time.time():
+                user_id = cached[0]
+            else:
+                data = jwt.decode(token, jwt_signing_keys()[0], algorithms=['HS256'])
+                user_id = data['user_id']
+                with auth_cache_lock:
+                    credential_cache[digest] = (user_id, data['exp'])
+            
+            current_user = load_auth_user(user_id)
+            if not current_user or not current_user.is_active:
+                raise Exception('User not found or inactive')
+            g.current_user = current_user
+        elif api_key:
+            digest = credential_digest(api_key)
+            with auth_cache_lock:
+                cached = credential_cache.get(digest)
+            if cached:
+                user_id, expires_at = cached
+                current_user = load_auth_user(user_id)
+            else:
+                # Key and owner in one joined SELECT instead of a lazy key_record.user load
+                row = db.session.execute(
+                    select(ApiKey.expires_at, *USER_LIST_COLUMNS)
+                    .join(ApiKey.user)
+                    .where(ApiKey.key_hash == digest, ApiKey.is_active.is_(True))
+                ).first()
+                if row is None:
+                    raise Exception('Invalid API key')
+                snapshot = row._asdict()
+                expires_at = snapshot.pop('expires_at')
+                with auth_cache_lock:
+                    credential_cache[digest] = (snapshot['id'], expires_at)
+                current_user = remember_auth_user(snapshot)
+            
+            if expires_at and expires_at < datetime.utcnow():
+                raise Exception('API key expired')
+            if not current_user:
+                raise Exception('Invalid API key')
+            g.current_user = current_user
+    except jwt.ExpiredSignatureError:
+        return json_response(ERR_TOKEN_EXPIRED, 401)
+    except Exception as e:
+        return json_response({
+            'success': False,
+            'error': 'Unauthorized',
+            'message': str(e)
+        }, 401)
+    
+    return None
 
 
 def token_required(f):
     """Decorator to protect routes with JWT authentication"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        # Check for token in header
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-        
-        # Check for API key
-        api_key = request.headers.get('X-API-Key')
-        
-        if not token and not api_key:
-            return jsonify({
-                'success': False,
-                'error': 'Unauthorized',
-                'message': 'Token or API key is required'
-            }), 401
-        
-        try:
-            if token:
-                data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-                current_user = User.query.get(data['user_id'])
-                if not current_user or not current_user.is_active:
-                    raise Exception('User not found or inactive')
-                g.current_user = current_user
-            elif api_key:
-                key_record = ApiKey.query.filter_by(key=api_key, is_active=True).first()
-                if not key_record:
-                    raise Exception('Invalid API key')
-                if key_record.expires_at and key_record.expires_at < datetime.utcnow():
-                    raise Exception('API key expired')
-                g.current_user = key_record.user
-                
-        except jwt.ExpiredSignatureError:
-            return jsonify({
-                'success': False,
-                'error': 'Unauthorized',
-                'message': 'Token has expired'
-            }), 401
-        except Exception as e:
-            return jsonify({
-                'success': False,
-                'error': 'Unauthorized',
-                'message': str(e)
-            }), 401
-        
+        error = authenticate()
+        if error is not None:
+            return error
         return f(*args, **kwargs)
     return decorated
 
 
 def admin_required(f):
-    """Decorator to require admin role"""
+    """Decorator to require admin role (authenticates in the same wrapper, not via token_required)"""
     @wraps(f)
-    @token_required
     def decorated(*args, **kwargs):
+        error = authenticate()
+        if error is not None:
+            return error
         if g.current_user.role != 'admin':
-            return jsonify({
-                'success': False,
-                'error': 'Forbidden',
-                'message': 'Admin access required'
-            }), 403
+            return json_response(ERR_ADMIN_REQUIRED, 403)
         return f(*args, **kwargs)
     return decorated
 
 
 # ==================== INPUT VALIDATION ====================
 
-def validate_user_data(data, is_update=False):
-    """Validate user input data"""
-    errors = []
-    
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+def iter_user_errors(data, is_update=False):
+    """Yield user validation errors, stopping early when required fields are missing"""
     if not is_update:
+        missing = False
         if not data.get('username'):
-            errors.append('Username is required')
+            missing = True
+            yield 'Username is required'
         if not data.get('email'):
-            errors.append('Email is required')
-    
-    if 'username' in data and data['username']:
-        if len(data['username']) < 3:
-            errors.append('Username must be at least 3 characters')
-        if len(data['username']) > 80:
-            errors.append('Username must not exceed 80 characters')
-    
-    if 'email' in data and data['email']:
-        if '@' not in data['email'] or '.' not in data['email']:
-            errors.append('Invalid email format')
-        if len(data['email']) > 120:
-            errors.append('Email must not exceed 120 characters')
-    
-    if 'password' in data and data['password']:
-        if len(data['password']) < 6:
-            errors.append('Password must be at least 6 characters')
-    
-    if 'role' in data and data['role'] not in ['user', 'admin']:
-        errors.append('Role must be "user" or "admin"')
-    
-    return errors
+            missing = True
+            yield 'Email is required'
+        if missing:
+            return
+    
+    username = data.get('username')
+    if username:
+        if not isinstance(username, str):
+            yield 'Username must be a string'
+        elif len(username) < 3:
+            yield 'Username must be at least 3 characters'
+        elif len(username) > 80:
+            yield 'Username must not exceed 80 characters'
+    
+    email = data.get('email')
+    if email:
+        if not isinstance(email, str):
+            yield 'Email must be a string'
+        elif len(email) > 120:
+            yield 'Email must not exceed 120 characters'
+        elif not EMAIL_RE.match(email):
+            yield 'Invalid email format'
+    
+    password = data.get('password')
+    if password:
+        if not isinstance(password, str):
+            yield 'Password must be a string'
+        elif len(password) < 6:
+            yield 'Password must be at least 6 characters'
+    
+    if 'role' in data and data['role'] not in ('user', 'admin'):
+        yield 'Role must be "user" or "admin"'
 
 
-def validate_product_data(data, is_update=False):
-    """Validate product input data"""
-    errors = []
-    
+def validate_user_data(data, is_update=False):
+    """Validate user input data"""
+    return list(iter_user_errors(data, is_update))
+
+
+def find_user_conflict(username=None, email=None, exclude_id=None):
+    """Return a conflict message if username or email is taken, using a single query"""
+    conditions = []
+    if username:
+        conditions.append(User.username == username)
+    if email:
+        conditions.append(User.email == email)
+    if not conditions:
+        return None
+    
+    # Only the two compared columns are fetched, never full User rows
+    query = db.session.query(User.username, User.email).filter(db.or_(*conditions))
+    if exclude_id is not None:
+        query = query.filter(User.id != exclude_id)
+    existing = query.limit(2).all()
+    
+    if username and any(u.username == username for u in existing):
+        return 'Username already exists'
+    if email and any(u.email == email for u in existing):
+        return 'Email already exists'
+    return None
+
+
+def text_length(value):
+    """len() of a string; any other type fails like an unparsable number"""
+    if not isinstance(value, str):
+        raise TypeError('Expected a string')
+    return len(value)
+
+
+# Largest value a SQLite INTEGER column (a signed 64-bit int) can hold
+SQLITE_MAX_INTEGER = 2 ** 63 - 1
+
+
+def whole_number(value):
+    """int() that never truncates: 3, 3.0 and '3' pass, 2.5 and 'inf' do not"""
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError('Not a whole number')
+    return int(value)
+
+
+# Per-field product checks, in error-reporting order:
+# (field, coerce, is_valid(coerced), message if coerce fails, message if is_valid fails)
+PRODUCT_FIELD_RULES = (
+    ('name', text_length, lambda length: length <= 100,
+     'Product name must be a string', 'Product name must not exceed 100 characters'),
+    ('description', text_length, lambda length: True,  # Text column: any length
+     'Description must be a string', None),
+    ('price', float, lambda price: price >= 0,
+     'Price must be a valid number', 'Price must be a positive number'),
+    ('quantity', whole_number, lambda quantity: 0 <= quantity <= SQLITE_MAX_INTEGER,
+     'Quantity must be a valid integer', f'Quantity must be an integer from 0 to {SQLITE_MAX_INTEGER}'),
+    ('category', text_length, lambda length: length <= 50,
+     'Category must be a string', 'Category must not exceed 50 characters'),
+)
+
+
+def iter_product_errors(data, is_update=False):
+    """Yield product validation errors, stopping early when required fields are missing"""
     if not is_update:
+        missing = False
         if not data.get('name'):
-            errors.append('Product name is required')
+            missing = True
+            yield 'Product name is required'
         if 'price' not in data:
-            errors.append('Price is required')
-    
-    if 'name' in data and data['name']:
-        if len(data['name']) > 100:
-            errors.append('Product name must not exceed 100 characters')
-    
-    if 'price' in data:
-        try:
-            price = float(data['price'])
-            if price < 0:
-                errors.append('Price must be a positive number')
-        except (ValueError, TypeError):
-            errors.append('Price must be a valid number')
-    
-    if 'quantity' in data:
+            missing = True
+            yield 'Price is required'
+        if missing:
+            return
+    
+    for field, coerce, is_valid, invalid, out_of_range in PRODUCT_FIELD_RULES:
+        # Text fields may be null or empty; numbers are checked whenever the key is present
+        if field not in data or (coerce is text_length and data[field] in (None, '')):
+            continue
         try:
-            quantity = int(data['quantity'])
-            if quantity < 0:
-                errors.append('Quantity must be a non-negative integer')
+            value = coerce(data[field])
         except (ValueError, TypeError):
-            errors.append('Quantity must be a valid integer')
-    
-    if 'category' in data and data['category']:
-        if len(data['category']) > 50:
-            errors.append('Category must not exceed 50 characters')
-    
-    return errors
+            yield invalid
+            continue
+        if not is_valid(value):
+            yield out_of_range
+
+
+def validate_product_data(data, is_update=False):
+    """Validate product input data"""
+    return list(iter_product_errors(data, is_update))
+
+
+# Insert columns taken from a product payload, with defaults and type coercions
+PRODUCT_INPUT_COLUMNS = ('name', 'description', 'price', 'quantity', 'category', 'is_available')
+PRODUCT_INPUT_DEFAULTS = {'description': '', 'quantity': 0, 'category': None, 'is_available': True}
+PRODUCT_INPUT_COERCERS = {'price': float, 'quantity': whole_number}
+PRODUCT_INPUT_FIELDS = tuple(
+    (column, PRODUCT_INPUT_DEFAULTS.get(column), PRODUCT_INPUT_COERCERS.get(column, lambda value: value))
+    for column in PRODUCT_INPUT_COLUMNS
+)
+
+
+def product_values(data):
+    """Column values for a validated product payload"""
+    return {column: coerce(data.get(column, default)) for column, default, coerce in PRODUCT_INPUT_FIELDS}
 
 
 # ==================== PAGINATION HELPER ====================
 
-def paginate(query, page=1, per_page=10, max_per_page=100):
-    """Paginate a SQLAlchemy query"""
+def serialize_rows(items, columns=None):
+    """Turn ORM objects via to_dict(), or column rows straight into dicts"""
+    if columns is None:
+        return [item.to_dict() for item in items]
+    return [dict(row._mapping) for row in items]
+
+
+def paginate(query, page=1, per_page=10, max_per_page=100, columns=None):
+    """Paginate a SQLAlchemy query, selecting only `columns` when given"""
     per_page = min(per_page, max_per_page)
+    if columns is not None:
+        query = query.with_entities(*columns)
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     
     return {
-        'items': [item.to_dict() for item in pagination.items],
+        'items': serialize_rows(pagination.items, columns),
         'pagination': {
             'page': pagination.page,
             'per_page': pagination.per_page,
@@ -332,46 +875,277 @@ def paginate(query, page=1, per_page=10, max_per_page=100):
     }
 
 
+def keyset_sort(model, sort_by=None):
+    """Column name keyset pagination orders by: sort_by if the model allows it, else id"""
+    return sort_by if sort_by in model.KEYSET_SORT_FIELDS else 'id'
+
+
+def encode_cursor(value, row_id):
+    """Opaque cursor for a (sort value, id) position"""
+    return b64url(orjson.dumps([value, row_id])).decode()
+
+
+def cursor_value_types(column):
+    """Python types a decoded cursor value may have for a keyset sort column"""
+    if isinstance(column.type, db.DateTime):
+        return (str,)  # Cursors carry the stored text, see paginate_keyset()
+    if isinstance(column.type, db.Float):
+        return (int, float)
+    return (column.type.python_type,)
+
+
+def decode_cursor(cursor, model, sort_by='id'):
+    """Parse a cursor from the query string; raises ValueError if it is malformed"""
+    if sort_by == 'id':
+        return int(cursor)
+    try:
+        value, row_id = orjson.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    # Only a scalar of the sort column's type may be bound into the row-value comparison
+    if (isinstance(value, bool) or not isinstance(value, cursor_value_types(getattr(model, sort_by)))
+            or type(row_id) is not int):
+        raise ValueError('Invalid cursor')
+    return value, row_id
+
+
+def paginate_keyset(query, model, columns, cursor=None, limit=100, max_limit=500,
+                    sort_by='id', descending=False):
+    """Keyset-paginate a SQLAlchemy query: WHERE (sort_col, id) > (:value, :id) LIMIT :n
+    
+    Sorting by id keeps plain integer cursors; other columns get an opaque
+    cursor holding the last row's sort value, with id as the tiebreaker.
+    """
+    limit = max(1, min(limit, max_limit))
+    sort_column = getattr(model, sort_by)
+    if isinstance(sort_column.type, db.DateTime):
+        # Compare stored text with stored text: a bound datetime would be
+        # rendered with a different fractional-second width than SQL_NOW writes
+        sort_column = db.type_coerce(sort_column, db.String)
+    query = query.with_entities(*columns, sort_column.label('cursor_value'))
+    
+    if cursor is not None:
+        if sort_by == 'id':
+            query = query.filter(model.id < cursor if descending else model.id > cursor)
+        else:
+            position, after = db.tuple_(sort_column, model.id), db.tuple_(*cursor)
+            query = query.filter(position < after if descending else position > after)
+    
+    order = [sort_column, model.id] if sort_by != 'id' else [model.id]
+    query = query.order_by(*(column.desc() if descending else column.asc() for column in order))
+    
+    # Fetch one extra row to learn whether another page exists
+    rows = query.limit(limit + 1).all()
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    
+    next_cursor = None
+    if has_next:
+        last = rows[-1]
+        next_cursor = last.id if sort_by == 'id' else encode_cursor(last.cursor_value, last.id)
+    
+    items = serialize_rows(rows, columns)
+    for item in items:
+        del item['cursor_value']
+    
+    return {
+        'items': items,
+        'pagination': {
+            'limit': limit,
+            'next_cursor': next_cursor,
+            'has_next': has_next
+        }
+    }
+
+
+def list_etag(model):
+    """Weak ETag for a list response: the query string plus the table's write counter"""
+    version = db.session.execute(TABLE_VERSION_QUERY, {'name': model.__tablename__}).scalar()
+    fingerprint = f'{request.full_path}|{version}'
+    return hashlib.blake2b(fingerprint.encode(), digest_size=16).hexdigest()
+
+
+def not_modified(etag):
+    """304 response that lets the client reuse its cached copy"""
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def revalidate_publicly(response):
+    """Let browsers and CDNs store a public response, but revalidate it (cheaply, via ETag) on every use"""
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+
+# ==================== BATCH HELPERS ====================
+
+# SQLite (3.32+) accepts up to 32766 bound parameters in one statement
+SQLITE_MAX_VARIABLES = 32766
+
+
+def insert_rows(model, rows, columns):
+    """INSERT all rows as multi-row VALUES statements and return the created rows as dicts"""
+    # Size insertmanyvalues pages to the parameter limit instead of the default 1000 rows
+    page_size = max(1, SQLITE_MAX_VARIABLES // len(rows[0]))
+    stmt = insert(model).returning(*columns).execution_options(insertmanyvalues_page_size=page_size)
+    
+    # Not sort_by_parameter_order=True: SQLite has no ordering sentinel, so that
+    # degrades to one INSERT per row. Ids are assigned in VALUES order within the
+    # write transaction, so sorting by id restores the input order.
+    created = [dict(row._mapping) for row in db.session.execute(stmt, rows)]
+    created.sort(key=itemgetter('id'))
+    return created
+
+
+# Created rows serialized per chunk of a streamed batch response
+BATCH_RESPONSE_CHUNK = 500
+
+
+def batch_response(noun, created, errors):
+    """Stream a batch-create response body, serializing created rows chunk by chunk"""
+    def generate():
+        yield b'{"success":true,"message":' + dump_json(
+            f'{len(created)} {noun} created, {len(errors)} failed'
+        ) + b',"data":{"created":['
+        for start in range(0, len(created), BATCH_RESPONSE_CHUNK):
+            chunk = b','.join(map(dump_json, created[start:start + BATCH_RESPONSE_CHUNK]))
+            yield chunk if start == 0 else b',' + chunk
+        yield b'],"errors":' + dump_json(errors) + b'}}'
+    
+    return Response(generate(), status=201 if created else 400, mimetype='application/json')
+
+
+# Per-index error for array entries the validators cannot read
+BATCH_ITEM_NOT_OBJECT = 'Item must be a JSON object'
+
+
+# Each password costs a synchronous Argon2 hash (~64 MiB, tens to hundreds of ms)
+# that holds the worker, so user batches are capped
+USER_BATCH_MAX = 25
+ERR_USER_BATCH_TOO_LARGE = prebuilt_error('Bad Request', f'At most {USER_BATCH_MAX} users can be created per request')
+
+
+def create_users_batch(items):
+    """Validate a list of user payloads and insert the valid ones in one transaction"""
+    if len(items) > USER_BATCH_MAX:
+        return json_response(ERR_USER_BATCH_TOO_LARGE, 400)
+    
+    rows = []
+    errors = []
+    
+    for idx, user_data in enumerate(items):
+        if not isinstance(user_data, dict):
+            errors.append({'index': idx, 'errors': [BATCH_ITEM_NOT_OBJECT]})
+            continue
+        validation_errors = validate_user_data(user_data)
+        if validation_errors:
+            errors.append({'index': idx, 'errors': validation_errors})
+            continue
+        rows.append((idx, {
+            'username': user_data['username'],
+            'email': user_data['email'],
+            'role': user_data.get('role', 'user'),
+            'password_hash': User.hash_password(user_data['password']) if user_data.get('password') else None
+        }))
+    
+    # One query for every username/email already taken, then dedupe within the batch
+    taken_usernames, taken_emails = set(), set()
+    if rows:
+        existing = db.session.query(User.username, User.email).filter(db.or_(
+            User.username.in_([row['username'] for _, row in rows]),
+            User.email.in_([row['email'] for _, row in rows])
+        )).all()
+        taken_usernames = {username for username, _ in existing}
+        taken_emails = {email for _, email in existing}
+    
+    new_rows = []
+    for idx, row in rows:
+        if row['username'] in taken_usernames:
+            errors.append({'index': idx, 'errors': ['Username already exists']})
+        elif row['email'] in taken_emails:
+            errors.append({'index': idx, 'errors': ['Email already exists']})
+        else:
+            taken_usernames.add(row['username'])
+            taken_emails.add(row['email'])
+            new_rows.append(row)
+    
+    created = []
+    if new_rows:
+        try:
+            created = insert_rows(User, new_rows, USER_LIST_COLUMNS)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return json_response(ERR_USER_EXISTS, 409)
+    
+    return batch_response('users', created, sorted(errors, key=itemgetter('index')))
+
+
+def create_products_batch(items):
+    """Validate a list of product payloads and insert the valid ones in one statement"""
+    rows = []
+    errors = []
+    
+    for idx, product_data in enumerate(items):
+        if not isinstance(product_data, dict):
+            errors.append({'index': idx, 'errors': [BATCH_ITEM_NOT_OBJECT]})
+            continue
+        validation_errors = validate_product_data(product_data)
+        if validation_errors:
+            errors.append({'index': idx, 'errors': validation_errors})
+        else:
+            rows.append(product_values(product_data))
+    
+    created = []
+    if rows:
+        try:
+            created = insert_rows(Product, rows, PRODUCT_RETURNING_COLUMNS)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return json_response({
+                'success': False,
+                'error': 'Database Error',
+                'message': str(e)
+            }, 500)
+    
+    return batch_response('products', created, errors)
+
+
 # ==================== ERROR HANDLERS ====================
 
 @app.errorhandler(400)
 def bad_request(error):
     """Handle 400 Bad Request errors"""
-    return jsonify({
+    return json_response({
         'success': False,
         'error': 'Bad Request',
         'message': str(error.description) if hasattr(error, 'description') else 'Invalid request'
-    }), 400
+    }, 400)
 
 
 @app.errorhandler(404)
 def not_found(error):
     """Handle 404 Not Found errors"""
-    return jsonify({
-        'success': False,
-        'error': 'Not Found',
-        'message': 'The requested resource was not found'
-    }), 404
+    return json_response(ERR_NOT_FOUND, 404)
 
 
 @app.errorhandler(409)
 def conflict(error):
     """Handle 409 Conflict errors"""
-    return jsonify({
+    return json_response({
         'success': False,
         'error': 'Conflict',
         'message': str(error.description) if hasattr(error, 'description') else 'Resource conflict'
-    }), 409
+    }, 409)
 
 
 @app.errorhandler(429)
 def ratelimit_handler(error):
     """Handle rate limit exceeded"""
-    return jsonify({
-        'success': False,
-        'error': 'Too Many Requests',
-        'message': 'Rate limit exceeded. Please try again later.'
-    }), 429
+    return json_response(ERR_RATE_LIMITED, 429)
 
 
 @app.errorhandler(500)
@@ -379,11 +1153,7 @@ def internal_error(error):
     """Handle 500 Internal Server errors"""
     db.session.rollback()
     logger.error(f"Internal Server Error: {error}")
-    return jsonify({
-        'success': False,
-        'error': 'Internal Server Error',
-        'message': 'An unexpected error occurred'
-    }), 500
+    return json_response(ERR_INTERNAL, 500)
 
 
 # ==================== HEALTH & INFO ROUTES ====================
@@ -397,7 +1167,7 @@ def index():
 @app.route('/api')
 def api_info():
     """API Home endpoint"""
-    return jsonify({
+    response = json_response({
         'success': True,
         'message': 'Welcome to the REST API',
         'version': '2.0',
@@ -416,40 +1186,104 @@ def api_info():
             'health': '/api/health'
         }
     })
+    # Static discovery document; let clients and proxies reuse it
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    return response
 
 
-@app.route('/api/health')
-def health_check():
-    """Health check endpoint"""
+# Liveness probes may poll several times a second; they share one ping per second
+health_cache = cachetools.TTLCache(maxsize=1, ttl=1)
+health_cache_lock = threading.Lock()
+
+
+def ping_database():
+    """Return the database status, pinging over a raw pooled connection at most once per TTL"""
+    with health_cache_lock:
+        status = health_cache.get('database')
+    if status is not None:
+        return status
+    
     try:
-        # Test database connection
-        db.session.execute(db.text('SELECT 1'))
-        db_status = 'healthy'
+        # Straight from the pool: no session or ORM transaction for a SELECT 1
+        connection = db.engine.raw_connection()
+        try:
+            connection.cursor().execute('SELECT 1')
+        finally:
+            connection.close()
+        status = 'healthy'
     except Exception as e:
-        db_status = f'unhealthy: {str(e)}'
+        status = f'unhealthy: {str(e)}'
     
-    return jsonify({
+    with health_cache_lock:
+        health_cache['database'] = status
+    return status
+
+
+@app.route('/api/health')
+@limiter.exempt
+def health_check():
+    """Health check endpoint"""
+    return json_response({
         'success': True,
         'status': 'healthy',
-        'timestamp': datetime.utcnow().isoformat(),
-        'database': db_status,
+        'timestamp': datetime.utcnow(),
+        'database': ping_database(),
         'version': '2.0'
     })
 
 
+# All counters in one round-trip: each entry becomes a scalar subquery of a single SELECT
+STATS_COUNTS = (
+    ('total_users', select(func.count()).select_from(User)),
+    ('active_users', select(func.count()).select_from(User).filter_by(is_active=True)),
+    ('total_products', select(func.count()).select_from(Product)),
+    ('available_products', select(func.count()).select_from(Product).filter_by(is_available=True)),
+    ('total_api_keys', select(func.count()).select_from(ApiKey).filter_by(is_active=True)),
+)
+STATS_QUERY = select(*(query.scalar_subquery().label(name) for name, query in STATS_COUNTS))
+stats_cache = cachetools.TTLCache(maxsize=1, ttl=5)  # Dashboard counters tolerate 5s staleness
+stats_cache_lock = threading.Lock()
+
+
+# Writes committed by this process drop the cached stats right away; the TTL only
+# bounds staleness from other workers. ORM flushes and Core DML through the
+# session (insert_rows, update(), delete()) are both seen.
+@event.listens_for(Session, 'after_flush')
+def note_flush_write(session, flush_context):
+    """Remember that this transaction wrote through the unit of work"""
+    session.info['wrote'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def note_statement_write(orm_execute_state):
+    """Remember that this transaction ran an INSERT/UPDATE/DELETE statement"""
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_stats_on_commit(session):
+    """Drop cached stats once a writing transaction commits"""
+    if session.info.pop('wrote', False):
+        with stats_cache_lock:
+            stats_cache.clear()
+
+
 @app.route('/api/stats')
 @token_required
 def get_stats():
     """Get API statistics (authenticated)"""
-    return jsonify({
+    with stats_cache_lock:
+        stats = stats_cache.get('stats')
+    if stats is None:
+        stats = dict(db.session.execute(STATS_QUERY).one()._mapping)
+        with stats_cache_lock:
+            stats_cache['stats'] = stats
+    
+    return json_response({
         'success': True,
-        'data': {
-            'total_users': User.query.count(),
-            'active_users': User.query.filter_by(is_active=True).count(),
-            'total_products': Product.query.count(),
-            'available_products': Product.query.filter_by(is_available=True).count(),
-            'total_api_keys': ApiKey.query.filter_by(is_active=True).count()
-        }
+        'data': stats
     })
 
 
@@ -459,39 +1293,25 @@ def get_stats():
 @limiter.limit("5 per hour")
 def register():
     """Register a new user"""
-    data = request.get_json()
+    data = parse_json()
     
     if not data:
-        return jsonify({
-            'success': False,
-            'error': 'Bad Request',
-            'message': 'No input data provided'
-        }), 400
+        return json_response(ERR_NO_INPUT, 400)
     
     errors = validate_user_data(data)
     if not data.get('password'):
         errors.append('Password is required')
     
     if errors:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Validation Error',
             'messages': errors
-        }), 400
-    
-    if User.query.filter_by(username=data['username']).first():
-        return jsonify({
-            'success': False,
-            'error': 'Conflict',
-            'message': 'Username already exists'
-        }), 409
+        }, 400)
     
-    if User.query.filter_by(email=data['email']).first():
-        return jsonify({
-            'success': False,
-            'error': 'Conflict',
-            'message': 'Email already exists'
-        }), 409
+    conflict = find_user_conflict(data['username'], data['email'])
+    if conflict:
+        return json_response(USER_CONFLICT_ERRORS[conflict], 409)
     
     try:
         new_user = User(
@@ -505,56 +1325,57 @@ def register():
         
         token = generate_token(new_user.id, new_user.role)
         
-        return jsonify({
+        return json_response({
             'success': True,
             'message': 'User registered successfully',
             'data': {
                 'user': new_user.to_dict(),
                 'token': token
             }
-        }), 201
+        }, 201)
     except Exception as e:
         db.session.rollback()
         logger.error(f"Registration error: {e}")
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Database Error',
             'message': str(e)
-        }), 500
+        }, 500)
 
 
 @app.route('/api/auth/login', methods=['POST'])
 @limiter.limit("10 per minute")
 def login():
     """Login and get JWT token"""
-    data = request.get_json()
+    data = parse_json()
     
-    if not data or not data.get('username') or not data.get('password'):
-        return jsonify({
-            'success': False,
-            'error': 'Bad Request',
-            'message': 'Username and password required'
-        }), 400
+    if (not data or not isinstance(data.get('username'), str) or not isinstance(data.get('password'), str)
+            or not data['username'] or not data['password']):
+        return json_response(ERR_CREDENTIALS_REQUIRED, 400)
     
     user = User.query.filter_by(username=data['username']).first()
     
-    if not user or not user.check_password(data['password']):
-        return jsonify({
-            'success': False,
-            'error': 'Unauthorized',
-            'message': 'Invalid username or password'
-        }), 401
+    if user is None:
+        try:
+            password_hasher.verify(DUMMY_PASSWORD_HASH, data['password'])
+        except VerificationError:
+            pass
+        return json_response(ERR_INVALID_CREDENTIALS, 401)
+    
+    if not user.check_password(data['password']):
+        return json_response(ERR_INVALID_CREDENTIALS, 401)
     
     if not user.is_active:
-        return jsonify({
-            'success': False,
-            'error': 'Forbidden',
-            'message': 'Account is deactivated'
-        }), 403
+        return json_response(ERR_ACCOUNT_DEACTIVATED, 403)
+    
+    # Legacy SHA-256 hashes (and outdated Argon2 parameters) are upgraded while the plain password is at hand
+    if user.password_needs_rehash():
+        user.set_password(data['password'])
+        db.session.commit()
     
     token = generate_token(user.id, user.role)
     
-    return jsonify({
+    return json_response({
         'success': True,
         'message': 'Login successful',
         'data': {
@@ -569,7 +1390,7 @@ def login():
 @token_required
 def get_current_user():
     """Get current authenticated user"""
-    return jsonify({
+    return json_response({
         'success': True,
         'data': g.current_user.to_dict()
     })
@@ -580,7 +1401,7 @@ def get_current_user():
 def list_api_keys():
     """List user's API keys"""
     keys = ApiKey.query.filter_by(user_id=g.current_user.id).all()
-    return jsonify({
+    return json_response({
         'success': True,
         'data': [key.to_dict() for key in keys]
     })
@@ -590,31 +1411,31 @@ def list_api_keys():
 @token_required
 def create_api_key():
     """Create new API key"""
-    data = request.get_json() or {}
+    data = parse_json() or {}
     
     name = data.get('name', 'API Key')
     expires_days = data.get('expires_days', 30)
     
     key = secrets.token_hex(32)
     api_key = ApiKey(
-        key=key,
         name=name,
         user_id=g.current_user.id,
         expires_at=datetime.utcnow() + timedelta(days=expires_days) if expires_days else None
     )
+    api_key.set_key(key)
     
     db.session.add(api_key)
     db.session.commit()
     
-    return jsonify({
+    return json_response({
         'success': True,
         'message': 'API key created. Store it securely - it won\'t be shown again.',
         'data': {
             'key': key,  # Show full key only on creation
             'name': name,
-            'expires_at': api_key.expires_at.isoformat() if api_key.expires_at else None
+            'expires_at': api_key.expires_at
         }
-    }), 201
+    }, 201)
 
 
 @app.route('/api/auth/api-keys/<int:key_id>', methods=['DELETE'])
@@ -624,16 +1445,13 @@ def delete_api_key(key_id):
     api_key = ApiKey.query.filter_by(id=key_id, user_id=g.current_user.id).first()
     
     if not api_key:
-        return jsonify({
-            'success': False,
-            'error': 'Not Found',
-            'message': 'API key not found'
-        }), 404
+        return json_response(ERR_API_KEY_NOT_FOUND, 404)
     
     db.session.delete(api_key)
     db.session.commit()
+    invalidate_credential(api_key.key_hash)
     
-    return jsonify({
+    return json_response({
         'success': True,
         'message': 'API key deleted successfully'
     })
@@ -646,9 +1464,16 @@ def delete_api_key(key_id):
 def get_users():
     """GET all users with pagination, search, and filtering"""
     try:
+        # Answer 304 without querying or serializing the page if nothing changed
+        etag = list_etag(User)
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+        
         # Pagination parameters
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
+        cursor = request.args.get('cursor') or request.args.get('after')
+        limit = request.args.get('limit', type=int)
         
         # Search parameter
         search = request.args.get('search', '')
@@ -666,12 +1491,7 @@ def get_users():
         
         # Apply search
         if search:
-            query = query.filter(
-                db.or_(
-                    User.username.ilike(f'%{search}%'),
-                    User.email.ilike(f'%{search}%')
-                )
-            )
+            query = query.filter(search_filter(User, search))
         
         # Apply filters
         if role:
@@ -679,81 +1499,83 @@ def get_users():
         if is_active is not None:
             query = query.filter(User.is_active == (is_active.lower() == 'true'))
         
-        # Apply sorting
-        if hasattr(User, sort_by):
-            order_column = getattr(User, sort_by)
-            if sort_order == 'desc':
-                query = query.order_by(order_column.desc())
-            else:
-                query = query.order_by(order_column.asc())
-        
-        result = paginate(query, page, per_page)
+        # Keyset pagination when a cursor or limit is given, offset pagination otherwise
+        if cursor is not None or limit is not None:
+            # Keyset pages follow id unless a keyset-capable sort_by is asked for explicitly
+            keyset_by = keyset_sort(User, request.args.get('sort_by'))
+            try:
+                position = decode_cursor(cursor, User, keyset_by) if cursor is not None else None
+            except ValueError:
+                return json_response(ERR_INVALID_CURSOR, 400)
+            # An id-ordered keyset defaults to ascending, matching plain ?after= cursors
+            keyset_order = request.args.get('sort_order', 'asc' if keyset_by == 'id' else 'desc')
+            result = paginate_keyset(
+                query, User, USER_LIST_COLUMNS, position, limit or 100,
+                sort_by=keyset_by, descending=keyset_order == 'desc'
+            )
+        else:
+            # Apply sorting
+            if hasattr(User, sort_by):
+                order_column = getattr(User, sort_by)
+                if sort_order == 'desc':
+                    query = query.order_by(order_column.desc())
+                else:
+                    query = query.order_by(order_column.asc())
+            
+            result = paginate(query, page, per_page, columns=USER_LIST_COLUMNS)
         
-        return jsonify({
+        response = json_response({
             'success': True,
             **result
-        }), 200
+        }, 200)
+        response.set_etag(etag, weak=True)
+        return response
     except Exception as e:
         logger.error(f"Get users error: {e}")
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Database Error',
             'message': str(e)
-        }), 500
+        }, 500)
 
 
 @app.route('/api/users/<int:user_id>', methods=['GET'])
 @token_required
 def get_user(user_id):
     """GET a specific user by ID"""
-    user = User.query.get(user_id)
+    user = db.session.get(User, user_id)
     if not user:
-        return jsonify({
-            'success': False,
-            'error': 'Not Found',
-            'message': f'User with ID {user_id} not found'
-        }), 404
+        return json_response(ERR_USER_ID_NOT_FOUND % user_id, 404)
     
-    return jsonify({
+    return json_response({
         'success': True,
         'data': user.to_dict()
-    }), 200
+    }, 200)
 
 
 @app.route('/api/users', methods=['POST'])
 @admin_required
 def create_user():
-    """CREATE a new user (admin only)"""
-    data = request.get_json()
+    """CREATE a new user, or a batch of users from a JSON array (admin only)"""
+    data = parse_json()
     
     if not data:
-        return jsonify({
-            'success': False,
-            'error': 'Bad Request',
-            'message': 'No input data provided'
-        }), 400
+        return json_response(ERR_NO_INPUT, 400)
+    
+    if isinstance(data, list):
+        return create_users_batch(data)
     
     errors = validate_user_data(data)
     if errors:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Validation Error',
             'messages': errors
-        }), 400
+        }, 400)
     
-    if User.query.filter_by(username=data['username']).first():
-        return jsonify({
-            'success': False,
-            'error': 'Conflict',
-            'message': 'Username already exists'
-        }), 409
-    
-    if User.query.filter_by(email=data['email']).first():
-        return jsonify({
-            'success': False,
-            'error': 'Conflict',
-            'message': 'Email already exists'
-        }), 409
+    conflict = find_user_conflict(data['username'], data['email'])
+    if conflict:
+        return json_response(USER_CONFLICT_ERRORS[conflict], 409)
     
     try:
         new_user = User(
@@ -767,75 +1589,52 @@ def create_user():
         db.session.add(new_user)
         db.session.commit()
         
-        return jsonify({
+        return json_response({
             'success': True,
             'message': 'User created successfully',
             'data': new_user.to_dict()
-        }), 201
+        }, 201)
     except Exception as e:
         db.session.rollback()
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Database Error',
             'message': str(e)
-        }), 500
+        }, 500)
 
 
 @app.route('/api/users/<int:user_id>', methods=['PUT'])
 @token_required
 def update_user(user_id):
     """UPDATE an existing user"""
-    user = User.query.get(user_id)
+    user = db.session.get(User, user_id)
     if not user:
-        return jsonify({
-            'success': False,
-            'error': 'Not Found',
-            'message': f'User with ID {user_id} not found'
-        }), 404
+        return json_response(ERR_USER_ID_NOT_FOUND % user_id, 404)
     
     # Only admin or user themselves can update
     if g.current_user.role != 'admin' and g.current_user.id != user_id:
-        return jsonify({
-            'success': False,
-            'error': 'Forbidden',
-            'message': 'You can only update your own profile'
-        }), 403
+        return json_response(ERR_OWN_PROFILE_ONLY, 403)
     
-    data = request.get_json()
+    data = parse_json()
     if not data:
-        return jsonify({
-            'success': False,
-            'error': 'Bad Request',
-            'message': 'No input data provided'
-        }), 400
+        return json_response(ERR_NO_INPUT, 400)
     
     errors = validate_user_data(data, is_update=True)
     if errors:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Validation Error',
             'messages': errors
-        }), 400
+        }, 400)
     
     # Check for duplicate username or email
+    conflict = find_user_conflict(data.get('username'), data.get('email'), exclude_id=user_id)
+    if conflict:
+        return json_response(USER_CONFLICT_ERRORS[conflict], 409)
+    
     if 'username' in data:
-        existing_user = User.query.filter_by(username=data['username']).first()
-        if existing_user and existing_user.id != user_id:
-            return jsonify({
-                'success': False,
-                'error': 'Conflict',
-                'message': 'Username already exists'
-            }), 409
         user.username = data['username']
-    
     if 'email' in data:
-        existing_user = User.query.filter_by(email=data['email']).first()
-        if existing_user and existing_user.id != user_id:
-            return jsonify({
-                'success': False,
-                'error': 'Conflict',
-                'message': 'Email already exists'
-            }), 409
         user.email = data['email']
     
     if 'password' in data:
@@ -850,53 +1649,47 @@ def update_user(user_id):
     
     try:
         db.session.commit()
-        return jsonify({
+        invalidate_auth_user(user_id)
+        return json_response({
             'success': True,
             'message': 'User updated successfully',
             'data': user.to_dict()
-        }), 200
+        }, 200)
     except Exception as e:
         db.session.rollback()
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Database Error',
             'message': str(e)
-        }), 500
+        }, 500)
 
 
 @app.route('/api/users/<int:user_id>', methods=['DELETE'])
 @admin_required
 def delete_user(user_id):
     """DELETE a user (admin only)"""
-    user = User.query.get(user_id)
+    user = db.session.get(User, user_id)
     if not user:
-        return jsonify({
-            'success': False,
-            'error': 'Not Found',
-            'message': f'User with ID {user_id} not found'
-        }), 404
+        return json_response(ERR_USER_ID_NOT_FOUND % user_id, 404)
     
     if user.id == g.current_user.id:
-        return jsonify({
-            'success': False,
-            'error': 'Forbidden',
-            'message': 'Cannot delete your own account'
-        }), 403
+        return json_response(ERR_DELETE_SELF, 403)
     
     try:
         db.session.delete(user)
         db.session.commit()
-        return jsonify({
+        invalidate_auth_user(user_id)
+        return json_response({
             'success': True,
             'message': 'User deleted successfully'
-        }), 200
+        }, 200)
     except Exception as e:
         db.session.rollback()
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Database Error',
             'message': str(e)
-        }), 500
+        }, 500)
 
 
 # ==================== PRODUCT CRUD OPERATIONS ====================
@@ -905,9 +1698,16 @@ def delete_user(user_id):
 def get_products():
     """GET all products with pagination, search, filtering, and sorting"""
     try:
+        # Answer 304 without querying or serializing the page if nothing changed
+        etag = list_etag(Product)
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+        
         # Pagination parameters
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
+        cursor = request.args.get('cursor') or request.args.get('after')
+        limit = request.args.get('limit', type=int)
         
         # Search parameter
         search = request.args.get('search', '')
@@ -928,12 +1728,7 @@ def get_products():
         
         # Apply search
         if search:
-            query = query.filter(
-                db.or_(
-                    Product.name.ilike(f'%{search}%'),
-                    Product.description.ilike(f'%{search}%')
-                )
-            )
+            query = query.filter(search_filter(Product, search))
         
         # Apply filters
         if category:
@@ -950,253 +1745,311 @@ def get_products():
             else:
                 query = query.filter(Product.quantity == 0)
         
-        # Apply sorting
-        if hasattr(Product, sort_by):
-            order_column = getattr(Product, sort_by)
-            if sort_order == 'desc':
-                query = query.order_by(order_column.desc())
-            else:
-                query = query.order_by(order_column.asc())
-        
-        result = paginate(query, page, per_page)
+        # Keyset pagination when a cursor or limit is given, offset pagination otherwise
+        if cursor is not None or limit is not None:
+            # Keyset pages follow id unless a keyset-capable sort_by is asked for explicitly
+            keyset_by = keyset_sort(Product, request.args.get('sort_by'))
+            try:
+                position = decode_cursor(cursor, Product, keyset_by) if cursor is not None else None
+            except ValueError:
+                return json_response(ERR_INVALID_CURSOR, 400)
+            # An id-ordered keyset defaults to ascending, matching plain ?after= cursors
+            keyset_order = request.args.get('sort_order', 'asc' if keyset_by == 'id' else 'desc')
+            result = paginate_keyset(
+                query, Product, PRODUCT_LIST_COLUMNS, position, limit or 100,
+                sort_by=keyset_by, descending=keyset_order == 'desc'
+            )
+        else:
+            # Apply sorting
+            if hasattr(Product, sort_by):
+                order_column = getattr(Product, sort_by)
+                if sort_order == 'desc':
+                    query = query.order_by(order_column.desc())
+                else:
+                    query = query.order_by(order_column.asc())
+            
+            result = paginate(query, page, per_page, columns=PRODUCT_LIST_COLUMNS)
         
-        return jsonify({
+        response = json_response({
             'success': True,
             **result
-        }), 200
+        }, 200)
+        response.set_etag(etag, weak=True)
+        return revalidate_publicly(response)
     except Exception as e:
         logger.error(f"Get products error: {e}")
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Database Error',
             'message': str(e)
-        }), 500
+        }, 500)
+
+
+# Category list for the newest products-table version; any write changes the ETag
+categories_cache = cachetools.TTLCache(maxsize=1, ttl=300)
+categories_cache_lock = threading.Lock()
 
 
 @app.route('/api/products/categories', methods=['GET'])
 def get_categories():
     """GET all unique product categories"""
     try:
-        categories = db.session.query(Product.category).distinct().filter(
-            Product.category.isnot(None)
-        ).all()
-        return jsonify({
+        # The version lookup is far cheaper than the DISTINCT scan it guards
+        etag = list_etag(Product)
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+        
+        with categories_cache_lock:
+            data = categories_cache.get(etag)
+        if data is None:
+            categories = db.session.query(Product.category).distinct().filter(
+                Product.category.isnot(None)
+            ).all()
+            data = [cat[0] for cat in categories if cat[0]]
+            with categories_cache_lock:
+                categories_cache[etag] = data
+        
+        response = json_response({
             'success': True,
-            'data': [cat[0] for cat in categories if cat[0]]
+            'data': data
         })
+        response.set_etag(etag, weak=True)
+        return revalidate_publicly(response)
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
+
+
+# Serialized GET /api/products/<id> bodies for hot products. Local writes evict
+# their entry; other gunicorn workers may serve the old body until the TTL expires,
+# so it is kept as short as the stats cache's
+product_cache = cachetools.TTLCache(maxsize=4096, ttl=5)
+product_cache_lock = threading.Lock()
+
+
+def invalidate_product(product_id):
+    """Drop a product's cached response body after it changes"""
+    with product_cache_lock:
+        product_cache.pop(product_id, None)
 
 
 @app.route('/api/products/<int:product_id>', methods=['GET'])
 def get_product(product_id):
     """GET a specific product by ID"""
-    product = Product.query.get(product_id)
-    if not product:
-        return jsonify({
-            'success': False,
-            'error': 'Not Found',
-            'message': f'Product with ID {product_id} not found'
-        }), 404
+    with product_cache_lock:
+        body = product_cache.get(product_id)
+    if body is not None:
+        return json_response(body, 200)
+    
+    # Column-only SELECT by primary key: the row is never mapped into an ORM instance
+    row = db.session.execute(select(*PRODUCT_LIST_COLUMNS).where(Product.id == product_id)).first()
+    if row is None:
+        return json_response(ERR_PRODUCT_ID_NOT_FOUND % product_id, 404)
     
-    return jsonify({
+    body = dump_json({
         'success': True,
-        'data': product.to_dict()
-    }), 200
+        'data': row._asdict()
+    })
+    with product_cache_lock:
+        product_cache[product_id] = body
+    return json_response(body, 200)
 
 
 @app.route('/api/products', methods=['POST'])
 @token_required
 def create_product():
-    """CREATE a new product"""
-    data = request.get_json()
+    """CREATE a new product, or a batch of products from a JSON array"""
+    data = parse_json()
     
     if not data:
-        return jsonify({
-            'success': False,
-            'error': 'Bad Request',
-            'message': 'No input data provided'
-        }), 400
+        return json_response(ERR_NO_INPUT, 400)
+    
+    if isinstance(data, list):
+        return create_products_batch(data)
     
     errors = validate_product_data(data)
     if errors:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Validation Error',
             'messages': errors
-        }), 400
+        }, 400)
     
     try:
-        new_product = Product(
-            name=data['name'],
-            description=data.get('description', ''),
-            price=float(data['price']),
-            quantity=int(data.get('quantity', 0)),
-            category=data.get('category'),
-            is_available=data.get('is_available', True)
-        )
-        db.session.add(new_product)
+        # INSERT ... RETURNING: no refresh SELECT after commit to serialize the new row
+        created = insert_rows(Product, [product_values(data)], PRODUCT_RETURNING_COLUMNS)[0]
         db.session.commit()
         
-        return jsonify({
+        return json_response({
             'success': True,
             'message': 'Product created successfully',
-            'data': new_product.to_dict()
-        }), 201
+            'data': created
+        }, 201)
     except Exception as e:
         db.session.rollback()
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Database Error',
             'message': str(e)
-        }), 500
+        }, 500)
 
 
 @app.route('/api/products/<int:product_id>', methods=['PUT'])
 @token_required
 def update_product(product_id):
-    """UPDATE an existing product"""
-    product = Product.query.get(product_id)
-    if not product:
-        return jsonify({
-            'success': False,
-            'error': 'Not Found',
-            'message': f'Product with ID {product_id} not found'
-        }), 404
-    
-    data = request.get_json()
+    """UPDATE an existing product with a single UPDATE ... RETURNING statement"""
+    data = parse_json()
     if not data:
-        return jsonify({
-            'success': False,
-            'error': 'Bad Request',
-            'message': 'No input data provided'
-        }), 400
+        return json_response(ERR_NO_INPUT, 400)
     
     errors = validate_product_data(data, is_update=True)
     if errors:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Validation Error',
             'messages': errors
-        }), 400
-    
-    # Update product fields
-    if 'name' in data:
-        product.name = data['name']
-    if 'description' in data:
-        product.description = data['description']
-    if 'price' in data:
-        product.price = float(data['price'])
-    if 'quantity' in data:
-        product.quantity = int(data['quantity'])
-    if 'category' in data:
-        product.category = data['category']
-    if 'is_available' in data:
-        product.is_available = data['is_available']
+        }, 400)
+    
+    changes = {column: coerce(data[column]) for column, _, coerce in PRODUCT_INPUT_FIELDS if column in data}
     
     try:
-        db.session.commit()
-        return jsonify({
+        row = None
+        if changes:
+            # Only rows that actually differ are written, so a no-op PUT leaves updated_at alone
+            stmt = update(Product).where(Product.id == product_id).where(db.or_(
+                *(getattr(Product, column).is_distinct_from(value) for column, value in changes.items())
+            )).values(**changes)
+            row = db.session.execute(stmt.returning(*PRODUCT_RETURNING_COLUMNS)).first()
+        
+        if row is None:
+            # Nothing to change (or no such product): answer with the stored row, no commit
+            stmt = select(*PRODUCT_LIST_COLUMNS).where(Product.id == product_id)
+            row = db.session.execute(stmt).first()
+            db.session.rollback()
+            if row is None:
+                return json_response(ERR_PRODUCT_ID_NOT_FOUND % product_id, 404)
+        else:
+            db.session.commit()
+            invalidate_product(product_id)
+        
+        return json_response({
             'success': True,
             'message': 'Product updated successfully',
-            'data': product.to_dict()
-        }), 200
+            'data': dict(row._mapping)
+        }, 200)
     except Exception as e:
         db.session.rollback()
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Database Error',
             'message': str(e)
-        }), 500
+        }, 500)
 
 
 @app.route('/api/products/<int:product_id>', methods=['DELETE'])
 @token_required
 def delete_product(product_id):
-    """DELETE a product"""
-    product = Product.query.get(product_id)
-    if not product:
-        return jsonify({
-            'success': False,
-            'error': 'Not Found',
-            'message': f'Product with ID {product_id} not found'
-        }), 404
-    
+    """DELETE a product with a single DELETE statement"""
     try:
-        db.session.delete(product)
+        result = db.session.execute(delete(Product).where(Product.id == product_id))
+        if result.rowcount == 0:
+            db.session.rollback()
+            return json_response(ERR_PRODUCT_ID_NOT_FOUND % product_id, 404)
+        
         db.session.commit()
-        return jsonify({
+        invalidate_product(product_id)
+        return json_response({
             'success': True,
             'message': 'Product deleted successfully'
-        }), 200
+        }, 200)
     except Exception as e:
         db.session.rollback()
-        return jsonify({
+        return json_response({
             'success': False,
             'error': 'Database Error',
             'message': str(e)
-        }), 500
+        }, 500)
 
 
 @app.route('/api/products/bulk', methods=['POST'])
 @admin_required
 def bulk_create_products():
     """Bulk create products (admin only)"""
-    data = request.get_json()
+    data = parse_json()
     
     if not data or not isinstance(data, list):
-        return jsonify({
-            'success': False,
-            'error': 'Bad Request',
-            'message': 'Expected an array of products'
-        }), 400
-    
-    created = []
-    errors = []
-    
-    for idx, product_data in enumerate(data):
-        validation_errors = validate_product_data(product_data)
-        if validation_errors:
-            errors.append({'index': idx, 'errors': validation_errors})
-            continue
-        
-        try:
-            product = Product(
-                name=product_data['name'],
-                description=product_data.get('description', ''),
-                price=float(product_data['price']),
-                quantity=int(product_data.get('quantity', 0)),
-                category=product_data.get('category'),
-                is_available=product_data.get('is_available', True)
-            )
-            db.session.add(product)
-            created.append(product)
-        except Exception as e:
-            errors.append({'index': idx, 'errors': [str(e)]})
+        return json_response(ERR_EXPECTED_PRODUCT_ARRAY, 400)
     
-    if created:
-        db.session.commit()
-    
-    return jsonify({
-        'success': True,
-        'message': f'{len(created)} products created, {len(errors)} failed',
-        'data': {
-            'created': [p.to_dict() for p in created],
-            'errors': errors
-        }
-    }), 201 if created else 400
+    return create_products_batch(data)
+
+
+# ==================== CACHE MAINTENANCE ====================
+
+def clear_caches():
+    """Empty every in-process cache (auth, stats, health, categories, products)"""
+    clear_auth_cache()
+    for cache, lock in (
+        (stats_cache, stats_cache_lock),
+        (health_cache, health_cache_lock),
+        (categories_cache, categories_cache_lock),
+        (product_cache, product_cache_lock),
+    ):
+        with lock:
+            cache.clear()
 
 
 # ==================== MAIN ====================
 
-if __name__ == '__main__':
-    # Create database tables
+def upgrade_api_keys_table(connection):
+    """Replace a plain-text `key` column with key_hash/key_prefix, hashing existing keys"""
+    columns = {column['name'] for column in db.inspect(connection).get_columns('api_keys')}
+    if 'key' not in columns:
+        return
+    
+    connection.exec_driver_sql('ALTER TABLE api_keys RENAME TO api_keys_legacy')
+    connection.exec_driver_sql('DROP INDEX IF EXISTS ix_api_keys_key')
+    ApiKey.__table__.create(connection)
+    # Copy rows as-is (key_hash briefly holds the plain key), then hash in Python
+    connection.exec_driver_sql(
+        'INSERT INTO api_keys (id, key_hash, key_prefix, name, user_id, is_active, created_at, expires_at) '
+        'SELECT id, key, substr(key, 1, 8), name, user_id, is_active, created_at, expires_at FROM api_keys_legacy'
+    )
+    legacy = connection.exec_driver_sql('SELECT id, key FROM api_keys_legacy').all()
+    if legacy:
+        connection.exec_driver_sql(
+            'UPDATE api_keys SET key_hash = ? WHERE id = ?',
+            [(ApiKey.hash_key(key), key_id) for key_id, key in legacy]
+        )
+    connection.exec_driver_sql('DROP TABLE api_keys_legacy')
+
+
+def init_db():
+    """Create database tables and the default admin user if missing"""
     with app.app_context():
         db.create_all()
         
+        # Databases from before API keys were hashed are converted in place
+        with db.engine.begin() as connection:
+            upgrade_api_keys_table(connection)
+        
+        # Tables created before search indexes existed get them (and a backfill) here
+        with db.engine.begin() as connection:
+            for model in SEARCH_MODELS:
+                create_search_index(model.__table__, connection)
+        
+        # Likewise the write counters behind the list ETags
+        with db.engine.begin() as connection:
+            for model in VERSIONED_MODELS:
+                create_version_tracking(model.__table__, connection)
+        
+        # And indexes declared on the models after their table was created
+        with db.engine.begin() as connection:
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(connection, checkfirst=True)
+        
         # Create default admin user if not exists
         admin = User.query.filter_by(username='admin').first()
         if not admin:
@@ -1211,6 +2064,15 @@ if __name__ == '__main__':
             print("Default admin user created (username: admin, password: admin123)")
         
         print("Database tables created successfully!")
-    
-    # Run the application
-    app.run(debug=True, host='0.0.0.0', port=5000)
+
+
+if __name__ == '__main__':
+    init_db()
+    
+    # The Werkzeug dev server (reloader, debugger) is for local development only
+    if os.environ.get('FLASK_ENV') == 'development':
+        app.run(debug=True, host='0.0.0.0', port=5000)
+    else:
+        print("For production, serve the app with: gunicorn -c gunicorn.conf.py app:app")
+        print("or, with SECRET_KEY set: uvicorn asgi:application --workers 4")
+        print("Set FLASK_ENV=development to use the built-in development server.")
@@ -0,0 +1,22 @@
+"""
+ASGI entrypoint for serving the REST API under an ASGI server
+Usage: python app.py && SECRET_KEY=... uvicorn asgi:application --workers 4 --loop uvloop
+"""
+import os
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy import inspect
+
+# Every uvicorn worker is its own process importing app.py: without a shared
+# SECRET_KEY each would sign JWTs with its own random key
+if not os.environ.get('SECRET_KEY'):
+    raise RuntimeError('SECRET_KEY must be set when serving through asgi.py')
+
+from app import app, db
+
+# Workers start concurrently, so none of them runs init_db(); `python app.py` does, once
+with app.app_context():
+    if not inspect(db.engine).has_table('table_versions'):
+        raise RuntimeError('Database schema is missing or outdated; run `python app.py` first')
+
+application = WsgiToAsgi(app)
@@ -10,7 +10,8 @@ class Config:
     """Base configuration"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-secret-key-here'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    JSON_SORT_KEYS = False
+    # SQLALCHEMY_ENGINE_OPTIONS and the SQLite PRAGMAs are set in app.py (which does not
+    # load this module): the pool it builds depends on whether the database is in memory
 
 
 class DevelopmentConfig(Config):
@@ -0,0 +1,36 @@
+"""
+Gunicorn configuration for serving the REST API in production
+Usage: gunicorn -c gunicorn.conf.py app:app
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# gthread by default; GUNICORN_WORKER_CLASS=gevent serves many idle/slow clients per worker.
+# The gevent worker monkey-patches itself after fork. That makes sockets cooperative,
+# but not the sqlite3 C driver: every query still blocks the worker's hub while it runs.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+keepalive = 5
+
+# Import the app once in the master so workers fork with it already loaded
+preload_app = True
+
+
+def on_starting(server):
+    """Create tables in the master, then drop its connections before forking"""
+    from app import app, db, init_db
+    init_db()
+    with app.app_context():
+        db.engine.dispose()
+
+
+def post_fork(server, worker):
+    """Never reuse a pooled SQLite connection inherited from the master"""
+    from app import app, db, start_log_listener
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # The log listener thread does not survive fork; give each worker its own
+    start_log_listener()
@@ -4,6 +4,7 @@ Populates the database with sample data for testing
 """
 
 from app import app, db, User, Product
+from sqlalchemy import distinct, func, insert, select
 import random
 
 # Sample data
@@ -33,16 +34,21 @@ def seed_users():
     """Seed sample users"""
     print("Seeding users...")
     
-    for username in USERNAMES:
-        if not User.query.filter_by(username=username).first():
-            user = User(
-                username=username,
-                email=f"{username}@{random.choice(DOMAINS)}",
-                role='user'
-            )
-            user.set_password('password123')
-            db.session.add(user)
-            print(f"  Created user: {username}")
+    # One query for the usernames already present, then one multi-row INSERT
+    existing = set(db.session.scalars(select(User.username).where(User.username.in_(USERNAMES))))
+    # Every demo user has the same password, so one (slow) Argon2 hash serves them all
+    password_hash = User.hash_password('password123')
+    rows = [{
+        'username': username,
+        'email': f"{username}@{random.choice(DOMAINS)}",
+        'role': 'user',
+        'password_hash': password_hash
+    } for username in USERNAMES if username not in existing]
+    
+    if rows:
+        db.session.execute(insert(User), rows)
+        for row in rows:
+            print(f"  Created user: {row['username']}")
     
     db.session.commit()
     print(f"Users seeded successfully! Total: {User.query.count()}")
@@ -52,18 +58,15 @@ def seed_products():
     """Seed sample products"""
     print("Seeding products...")
     
-    for product_data in PRODUCTS:
-        if not Product.query.filter_by(name=product_data['name']).first():
-            product = Product(
-                name=product_data['name'],
-                description=product_data['description'],
-                price=product_data['price'],
-                quantity=product_data['quantity'],
-                category=product_data['category'],
-                is_available=True
-            )
-            db.session.add(product)
-            print(f"  Created product: {product_data['name']}")
+    names = [product_data['name'] for product_data in PRODUCTS]
+    existing = set(db.session.scalars(select(Product.name).where(Product.name.in_(names))))
+    rows = [dict(product_data, is_available=True)
+            for product_data in PRODUCTS if product_data['name'] not in existing]
+    
+    if rows:
+        db.session.execute(insert(Product), rows)
+        for row in rows:
+            print(f"  Created product: {row['name']}")
     
     db.session.commit()
     print(f"Products seeded successfully! Total: {Product.query.count()}")
@@ -86,7 +89,8 @@ def seed_all():
         print(f"\nSummary:")
         print(f"  - Users: {User.query.count()}")
         print(f"  - Products: {Product.query.count()}")
-        print(f"  - Categories: {len(set(p.category for p in Product.query.all() if p.category))}")
+        category_count = db.session.scalar(select(func.count(distinct(Product.category))).where(Product.category != ''))
+        print(f"  - Categories: {category_count}")
 
 
 if __name__ == '__main__':
@@ -9,123 +9,244 @@ import pytest
 import sys
 import os
 import uuid
+import orjson
+from argon2 import PasswordHasher, profiles
+from flask import Response
+from sqlalchemy import event
+from werkzeug.test import TestResponse
+from sqlalchemy.orm import scoped_session, sessionmaker
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Run against a shared in-memory database; app.py builds its engine at import
+os.environ['DATABASE_URL'] = 'sqlite://'
 
-@pytest.fixture(scope='function')
+
+@pytest.fixture(scope='session')
 def app():
-    """Create application for testing"""
-    from app import app as flask_app, db
-    
-    # Use a unique database for each test
-    test_db = f'test_{uuid.uuid4().hex}.db'
+    """Create the application and its schema once for the whole test session"""
+    import app as app_module
+    from app import app as flask_app, db, limiter
     
     flask_app.config['TESTING'] = True
-    flask_app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{test_db}'
-    flask_app.config['RATELIMIT_ENABLED'] = False
-    flask_app.config['RATELIMIT_STORAGE_URL'] = 'memory://'
+    # Production Argon2 costs ~0.3s per hash; the suite hashes on every account it creates
+    app_module.password_hasher = PasswordHasher.from_parameters(profiles.CHEAPEST)
+    # The limiter read RATELIMIT_ENABLED when app.py initialized it; switch it off directly
+    limiter.enabled = False
     
     with flask_app.app_context():
+        engine = db.engine
+        # pysqlite's own transaction handling ends a transaction at RELEASE SAVEPOINT;
+        # let SQLAlchemy emit BEGIN itself so per-test savepoints nest properly
+        with engine.connect() as connection:
+            connection.connection.driver_connection.isolation_level = None
+        event.listen(engine, 'begin', lambda connection: connection.exec_driver_sql('BEGIN'))
+        
         db.create_all()
-        yield flask_app
-        db.session.remove()
+    
+    # No app context stays pushed: requests made by session fixtures must get
+    # (and tear down) their own, or their session's transaction would stay open
+    yield flask_app
+    
+    with flask_app.app_context():
         db.drop_all()
+
+
+@pytest.fixture(scope='function', autouse=True)
+def transaction(app, admin_headers, auth_headers):
+    """Run each test inside a transaction that is rolled back afterwards"""
+    # The shared accounts are requested here so they always exist before the
+    # transaction starts, even when a test only asks for them via getfixturevalue()
+    from app import db, clear_caches
     
-    # Cleanup
-    try:
-        if os.path.exists(test_db):
-            os.unlink(test_db)
-    except:
-        pass
+    # In-process caches must not leak between tests
+    clear_caches()
+    
+    with app.app_context():
+        connection = db.engine.connect()
+        outer = connection.begin()
+        # Commits made by the app only release a SAVEPOINT inside the outer transaction.
+        # A plain sessionmaker: Flask-SQLAlchemy's Session.get_bind() ignores `bind`.
+        # Nothing else writes to this connection, so objects need no reload after commit
+        app_session = db.session
+        db.session = scoped_session(
+            sessionmaker(bind=connection, join_transaction_mode='create_savepoint',
+                         expire_on_commit=False),
+            scopefunc=app_session.registry.scopefunc
+        )
+        
+        yield connection
+        
+        db.session.remove()
+        db.session = app_session
+        outer.rollback()
+        connection.close()
 
 
-@pytest.fixture(scope='function')
+class JSONTestResponse(TestResponse, Response):
+    """Test response whose JSON body is decoded once, with orjson, however often get_json() is called"""
+    
+    _json = None
+    
+    def get_json(self, force=False, silent=False):
+        if not (force or self.is_json):
+            return None
+        if self._json is None:
+            try:
+                self._json = orjson.loads(self.get_data())
+            except orjson.JSONDecodeError:
+                if not silent:
+                    raise
+                return None
+        return self._json
+
+
+def make_client(app, authorization=None):
+    """Cookie-less test client; an Authorization header, if given, goes on every request"""
+    test_client = app.test_client(use_cookies=False)
+    test_client.response_wrapper = JSONTestResponse
+    if authorization:
+        test_client.environ_base['HTTP_AUTHORIZATION'] = authorization
+    return test_client
+
+
+@pytest.fixture(scope='session')
 def client(app):
     """Create a test client for the Flask application"""
-    with app.test_client() as test_client:
-        yield test_client
+    return make_client(app)
 
 
-@pytest.fixture(scope='function')  
-def auth_headers(client, app):
-    """Create a test user and return authentication headers"""
-    response = client.post('/api/auth/register', json={
-        'username': f'testuser_{uuid.uuid4().hex[:8]}',
-        'email': f'test_{uuid.uuid4().hex[:8]}@example.com',
-        'password': 'password123'
-    })
+# Session-scoped accounts are set up before the first test's transaction begins,
+# so they are committed for real and survive every per-test rollback
+
+def create_account(app, prefix, role):
+    """Insert a user directly and return headers with a token minted for it"""
+    from app import db, User, generate_token
     
-    data = response.get_json()
-    if data and 'data' in data and 'token' in data['data']:
-        return {'Authorization': f'Bearer {data["data"]["token"]}'}
+    uid = uuid.uuid4().hex[:8]
     
-    return {'Authorization': 'Bearer invalid'}
+    # Own app context: committed outside any test transaction
+    with app.app_context():
+        user = User(
+            username=f'{prefix}_{uid}',
+            email=f'{prefix}_{uid}@example.com',
+            role=role
+        )
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        token = generate_token(user.id, user.role)
+    
+    return {'Authorization': f'Bearer {token}'}
 
 
-@pytest.fixture(scope='function')
-def admin_headers(client, app):
+@pytest.fixture(scope='session')
+def auth_headers(app):
+    """Create a test user and return authentication headers"""
+    return create_account(app, 'testuser', 'user')
+
+
+@pytest.fixture(scope='session')
+def admin_headers(app):
     """Create an admin user and return authentication headers"""
-    from app import db, User
-    import uuid
-    
-    uid = uuid.uuid4().hex[:8]
+    return create_account(app, 'adminuser', 'admin')
+
+
+@pytest.fixture(scope='session')
+def admin_client(app, admin_headers):
+    """Test client that sends the admin's token with every request"""
+    return make_client(app, admin_headers['Authorization'])
+
+
+@pytest.fixture(scope='function')
+def sample_product(transaction):
+    """Create a sample product and return its data"""
+    from app import db, Product
     
-    # Create admin user directly in the existing context
-    admin = User(
-        username=f'adminuser_{uid}',
-        email=f'admin_{uid}@example.com',
-        role='admin'
+    product = Product(
+        name=f'Test Product {uuid.uuid4().hex[:8]}',
+        description='A test product',
+        price=99.99,
+        quantity=10,
+        category='Electronics'
     )
-    admin.set_password('admin123')
-    db.session.add(admin)
+    db.session.add(product)
     db.session.commit()
-    
-    # Login and get token
-    response = client.post('/api/auth/login', json={
-        'username': f'adminuser_{uid}',
-        'password': 'admin123'
-    })
-    
-    data = response.get_json()
-    if data and 'data' in data and 'token' in data['data']:
-        return {'Authorization': f'Bearer {data["data"]["token"]}'}
-    return {'Authorization': 'Bearer invalid'}
+    return product.to_dict()
+
+
+@pytest.fixture(scope='session')
+def catalog_rows():
+    """Rows of the shared read-only product catalog"""
+    return [{
+        'name': f'Catalog Product {i}',
+        'description': 'A catalog product',
+        'price': 10.00 + i,
+        'quantity': i,
+        'category': 'Electronics' if i % 2 else 'Books'
+    } for i in range(20)]
 
 
 @pytest.fixture(scope='function')
-def sample_product(client, admin_headers):
-    """Create a sample product and return its data"""
-    import uuid
-    response = client.post('/api/products', 
-        json={
-            'name': f'Test Product {uuid.uuid4().hex[:8]}',
-            'description': 'A test product',
-            'price': 99.99,
-            'quantity': 10,
-            'category': 'Electronics'
-        },
-        headers=admin_headers
-    )
-    data = response.get_json()
-    return data.get('data', {})
+def product_catalog(transaction, catalog_rows):
+    """Insert the catalog with one executemany INSERT and return its rows"""
+    from app import db, Product
+    from sqlalchemy import insert
+    
+    db.session.execute(insert(Product), catalog_rows)
+    db.session.commit()
+    return catalog_rows
 
 
 @pytest.fixture(scope='function')
-def sample_user(client, admin_headers):
-    """Create a sample user via admin and return its data"""
-    import uuid
+def sample_user(transaction):
+    """Create a sample user and return its data"""
+    from app import db, User
+    
     uid = uuid.uuid4().hex[:8]
-    response = client.post('/api/users',
-        json={
-            'username': f'sampleuser_{uid}',
-            'email': f'sample_{uid}@example.com',
-            'password': 'sample123',
-            'role': 'user'
-        },
-        headers=admin_headers
+    user = User(
+        username=f'sampleuser_{uid}',
+        email=f'sample_{uid}@example.com',
+        role='user'
     )
-    data = response.get_json()
-    return data.get('data', {})
-    return response.get_json()['data']
+    user.set_password('sample123')
+    db.session.add(user)
+    db.session.commit()
+    return user.to_dict()
+
+
+@pytest.fixture(scope='session')
+def pipeline(client):
+    """Run dependent requests in order; returns a runner giving back every response
+    
+    Each step is (method, path, json). Paths may refer to earlier results'
+    'data' payloads with str.format fields, e.g. '/api/products/{0[id]}'.
+    """
+    def run(headers, steps):
+        responses, results = [], []
+        for method, path, payload in steps:
+            response = client.open(path.format(*results), method=method, json=payload, headers=headers)
+            responses.append(response)
+            results.append((response.get_json() or {}).get('data'))
+        return responses
+    
+    return run
+
+
+@pytest.fixture(scope='session')
+def assert_ok():
+    """Assert a successful response; returns a checker for status, success and 'data' fields
+    
+    e.g. assert_ok(response, name='Updated Product') checks a 200 with
+    success true and data['name'] equal to 'Updated Product'.
+    """
+    def check(response, status=200, **fields):
+        assert response.status_code == status
+        data = response.get_json()
+        assert data['success'] is True
+        for field, value in fields.items():
+            assert data['data'][field] == value, (field, data['data'][field], value)
+        return data
+    
+    return check
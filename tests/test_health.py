@@ -14,9 +14,9 @@ class TestHealthEndpoint:
         assert response.status_code == 200
         data = response.get_json()
         assert data['success'] is True
-        assert data['data']['status'] == 'healthy'
-        assert 'database' in data['data']
-        assert 'version' in data['data']
+        assert data['status'] == 'healthy'
+        assert 'database' in data
+        assert 'version' in data
     
     def test_health_check_no_auth_required(self, client):
         """Test health endpoint doesn't require authentication"""
@@ -0,0 +1,59 @@
+"""
+Property-based tests for product validation
+"""
+from hypothesis import HealthCheck, given, settings, strategies as st
+
+
+def not_a_number(value):
+    """True if float() rejects the value, as the price validator does"""
+    try:
+        float(value)
+    except (ValueError, TypeError):
+        return True
+    return False
+
+
+# Prices the API must refuse: negative numbers, or strings that are not numbers
+invalid_prices = st.one_of(
+    st.floats(max_value=-0.01, allow_nan=False),
+    st.text(max_size=10).filter(not_a_number),
+)
+
+# Function-scoped fixtures (the per-test transaction) are shared by every example;
+# that is fine here because rejected requests never write
+validation_settings = settings(
+    max_examples=25,
+    suppress_health_check=[HealthCheck.function_scoped_fixture]
+)
+
+
+class TestProductValidation:
+    """Test invalid product payloads are rejected"""
+    
+    @validation_settings
+    @given(price=invalid_prices)
+    def test_create_product_invalid_price(self, admin_client, price):
+        """Test product creation with an invalid price"""
+        response = admin_client.post('/api/products', json={'name': 'Bad Product', 'price': price})
+        
+        assert response.status_code == 400
+        assert response.get_json()['success'] is False
+    
+    @validation_settings
+    @given(price=invalid_prices)
+    def test_update_product_invalid_price(self, admin_client, sample_product, price):
+        """Test updating product with an invalid price"""
+        response = admin_client.put(f"/api/products/{sample_product['id']}", json={'price': price})
+        
+        assert response.status_code == 400
+    
+    # Bounded below by the 64-bit range orjson can encode into the request body
+    @validation_settings
+    @given(quantity=st.integers(min_value=-2**63, max_value=-1))
+    def test_create_product_negative_quantity(self, admin_client, quantity):
+        """Test product creation with a negative quantity"""
+        response = admin_client.post('/api/products',
+            json={'name': 'Bad Product', 'price': 1.00, 'quantity': quantity}
+        )
+        
+        assert response.status_code == 400